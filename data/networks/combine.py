@@ -4,8 +4,10 @@
 Create a **MATSim‑compatible** network by merging a vehicle (drive) graph and
 a pedestrian (walk) graph given in GraphML.  The script:
 
-* uses only the Python standard library plus **networkx**;
+* uses only the Python standard library plus **numpy** and **pyproj**;
 * writes two outputs side‑by‑side:  `<name>.xml` and `<name>.xml.gz`;
+* streams the GraphML input and the MATSim output instead of building a
+  DOM or a networkx graph;
 * injects the required MATSim DTD line;
 * provides sensible defaults (15 m/s for cars, 1.4 m/s for walking, great‑
   circle fallback for missing link lengths).
@@ -20,15 +22,24 @@ from __future__ import annotations
 
 import argparse
 import gzip
-import math
+import shutil
+import subprocess
 import sys
+import tempfile
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict
+from typing import Dict, List, TextIO, Tuple
+from xml.sax.saxutils import escape
 from pyproj import Transformer
 
-import networkx as nx
+import numpy as np
 import xml.etree.ElementTree as ET
 
+try:
+    from numba import vectorize
+except ImportError:  # optional: plain numpy is used instead
+    vectorize = None
+
 # ----------------------------------------------------------------------
 # constants & defaults
 # ----------------------------------------------------------------------
@@ -37,172 +48,290 @@ WALK_DEFAULT_SPEED = 1.4      # [m/s]
 DEFAULT_CAPACITY   = 1000.0   # [pcu/h]
 DEFAULT_LANES      = 1
 MATSim_DOCTYPE     = (
-    b'<!DOCTYPE network SYSTEM "http://www.matsim.org/files/dtd/network_v2.dtd">\n'
+    '<!DOCTYPE network SYSTEM "http://www.matsim.org/files/dtd/network_v2.dtd">\n'
 )
+GZIP_LEVEL         = 6
+COPY_BUFSIZE       = 1 << 20    # [bytes]
+WRITE_BATCH        = 1 << 16    # nodes/links formatted per write
+INDENT             = "  "       # one nesting level; "" with --no-pretty
+XML_DECLARATION    = '<?xml version="1.0" encoding="utf-8"?>\n'
+_ATTR_ENTITIES     = {'"': "&quot;"}
+
+# GraphML attributes actually consumed by graph_to_matsim; everything else
+# is skipped while parsing.
+NODE_ATTRS = frozenset({"x", "y", "lon", "lat", "lng"})
+EDGE_ATTRS = frozenset({"distance", "length", "walking_speed", "maxspeed", "oneway"})
+
+# Raw GraphML spellings of a true "oneway" flag, matched without lower‑casing
+_ONEWAY_TRUE = frozenset({"true", "True", "TRUE", "1", "1.0", "yes", "Yes", "YES"})
+# Edge attributes tried in order for the free speed [m/s]
+_SPEED_KEYS = ("walking_speed", "maxspeed")
+
+# (nodes, edges): prefixed node ID -> (lon, lat), and (source, target, attrs)
+Graph = Tuple[Dict[str, Tuple[float, float]], List[Tuple[str, str, Dict[str, str]]]]
+
+
+@lru_cache(maxsize=None)
+def get_transformer(src_crs: str = "EPSG:4326", dst_crs: str = "EPSG:5179") -> Transformer:
+    """Return a cached lon/lat‑ordered transformer from *src_crs* to *dst_crs*.
+
+    Building a Transformer resolves both CRSs and selects a PROJ operation,
+    which costs far more than transforming a batch of points; callers should
+    reuse the instance (and pass whole arrays) rather than rebuild it.
+    """
+    return Transformer.from_crs(src_crs, dst_crs, always_xy=True)
+
 
-# Transformer: WGS84 → Korea Central (EPSG:5179)
-transformer = Transformer.from_crs("EPSG:4326", "EPSG:5179", always_xy=True)
+# Transformer: WGS84 → Korea Central (EPSG:5179).  Built once at import and
+# reused; coordinates are transformed in bulk, never one point at a time.
+transformer = get_transformer()
 
 
 # ----------------------------------------------------------------------
 # helpers
 # ----------------------------------------------------------------------
 
-def haversine(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
-    """Return great‑circle distance in *metres* between two lon/lat points."""
+def haversine(
+    lon1: np.ndarray, lat1: np.ndarray, lon2: np.ndarray, lat2: np.ndarray
+) -> np.ndarray:
+    """Return great‑circle distances in *metres* between lon/lat point arrays."""
     R = 6_371_000  # Earth radius [m]
-    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
     dphi       = phi2 - phi1
-    dlambda    = math.radians(lon2 - lon1)
-    a = math.sin(dphi / 2)**2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2)**2
-    return 2 * R * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-
-def read_graph(path: Path) -> nx.Graph:
+    dlambda    = np.radians(lon2 - lon1)
+    a = np.sin(dphi / 2)**2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2)**2
+    return 2 * R * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+if vectorize is not None:
+    # With numba the same body compiles to a single fused ufunc: no temporary
+    # arrays, and cheap on scalars too.  The explicit signature compiles it at
+    # import (cached on disk) so the first real call is not a JIT compile.
+    haversine = vectorize(
+        ["float64(float64, float64, float64, float64)"], cache=True, fastmath=True
+    )(haversine)
+
+
+def parse_graphml(path: Path, node_prefix: str = "") -> Graph:
+    """Read the GraphML file at *path* into a plain ``(nodes, edges)`` pair.
+
+    *nodes* maps ``node_prefix + id`` to ``(lon, lat)``; *edges* lists
+    ``(source, target, attrs)`` with prefixed endpoints and the raw string
+    values of :data:`EDGE_ATTRS`.  IDs are XML‑escaped here, once.  The file
+    is parsed incrementally and each element is dropped from the tree as
+    soon as it has been consumed.
+    """
+    nodes: Dict[str, Tuple[float, float]] = {}
+    edges: List[Tuple[str, str, Dict[str, str]]] = []
+    keys: Dict[str, str] = {}      # GraphML key id -> attribute name
+    pids: Dict[str, str] = {}      # raw node id -> prefixed id
+
+    def prefixed(nid: str) -> str:
+        pid = pids.get(nid)
+        if pid is None:
+            pid = pids[nid] = escape(f"{node_prefix}{nid}", _ATTR_ENTITIES)
+        return pid
+
+    graph = None
     try:
-        return nx.read_graphml(path)
-    except Exception as exc:
+        for event, elem in ET.iterparse(path, events=("start", "end")):
+            tag = elem.tag.rpartition("}")[2]
+            if event == "start":
+                if tag == "graph":
+                    graph = elem
+                continue
+
+            if tag == "key":
+                name = elem.get("attr.name")
+                if name in (NODE_ATTRS if elem.get("for") == "node" else EDGE_ATTRS):
+                    keys[elem.get("id")] = name
+            elif tag == "node":
+                nid = elem.get("id")
+                attrs = {keys[d.get("key")]: d.text for d in elem if d.get("key") in keys}
+                lon = attrs.get("x") or attrs.get("lon") or attrs.get("lng")
+                lat = attrs.get("y") or attrs.get("lat")
+                if lon is None or lat is None:
+                    raise ValueError(f"Node {nid} missing coordinate attributes in GraphML")
+                # first definition wins for duplicated IDs
+                nodes.setdefault(prefixed(nid), (float(lon), float(lat)))
+                graph.remove(elem)
+            elif tag == "edge":
+                attrs = {keys[d.get("key")]: d.text for d in elem if d.get("key") in keys}
+                edges.append((prefixed(elem.get("source")), prefixed(elem.get("target")), attrs))
+                graph.remove(elem)
+    except (ET.ParseError, OSError) as exc:
         sys.exit(f"Error reading {path}: {exc}")
 
-# ----------------------------------------------------------------------
-# XML builders
-# ----------------------------------------------------------------------
-
-def build_network_root() -> ET.Element:
-    root = ET.Element("network")
-    ET.SubElement(root, "nodes")
-    ET.SubElement(root, "links")
-    return root
+    # an edge to an undeclared node would become a dangling MATSim link
+    for src, tgt, _ in edges:
+        for pid in (src, tgt):
+            if pid not in nodes:
+                nid = next(raw for raw, prefixed_id in pids.items() if prefixed_id == pid)
+                raise ValueError(f"Node {nid} missing coordinate attributes in GraphML")
 
+    return nodes, edges
 
-def add_node(root: ET.Element, node_id: str, x: float, y: float) -> None:
-    ET.SubElement(root.find("nodes"), "node", {"id": node_id, "x": f"{x}", "y": f"{y}"})
+# ----------------------------------------------------------------------
+# XML writers
+# ----------------------------------------------------------------------
+# Nodes are written straight into the output file.  MATSim wants every
+# <node> before the first <link>, so links are spooled to a temporary file
+# and appended once all graphs have been converted.  Every element sits on
+# its own line; *indent* is the whitespace per nesting level.
+
+def write_nodes(
+    nodes: TextIO,
+    node_ids: List[str],
+    xs: List[float],
+    ys: List[float],
+    indent: str = INDENT,
+) -> None:
+    """Write <node> elements, WRITE_BATCH rows per %‑template pass."""
+    # %r keeps the shortest round‑tripping float repr
+    tpl = f'{indent * 2}<node id="%s" x="%r" y="%r" />\n'
+    for start in range(0, len(node_ids), WRITE_BATCH):
+        stop = start + WRITE_BATCH
+        rows = zip(node_ids[start:stop], xs[start:stop], ys[start:stop])
+        nodes.write("".join(map(tpl.__mod__, rows)))
 
 
-def add_link(
-    root: ET.Element,
-    link_id: str,
-    from_id: str,
-    to_id: str,
-    length: float,
-    freespeed: float,
+def write_links(
+    links: TextIO,
+    link_prefix: str,
+    from_ids: List[str],
+    to_ids: List[str],
+    lengths: List[float],
+    freespeeds: List[float],
     modes: str,
     capacity: float = DEFAULT_CAPACITY,
     permlanes: int = DEFAULT_LANES,
+    indent: str = INDENT,
 ) -> None:
-    """Insert a <link> element using MATSim attribute names."""
-    attr = {
-        "id":        link_id,
-        "from":      from_id,   # MATSim expects exactly "from"
-        "to":        to_id,
-        "length":    f"{length:.3f}",
-        "freespeed": f"{freespeed:.3f}",
-        "capacity":  f"{capacity:.1f}",
-        "permlanes": str(permlanes),
-        "modes":     modes,
-    }
-    ET.SubElement(root.find("links"), "link", attr)
+    """Write <link> elements ``<link_prefix>0 …`` using MATSim attribute names.
+
+    Rows are formatted WRITE_BATCH at a time with a single %‑template (the
+    per‑graph constants are baked in up front) and written as one string.
+    """
+    def lit(value: str) -> str:
+        return value.replace("%", "%%")
+
+    # MATSim expects exactly "from"
+    tpl = (
+        f'{indent * 2}<link id="{lit(link_prefix)}%d" from="%s" to="%s"'
+        f' length="%.3f" freespeed="%.3f"'
+        f' capacity="{capacity:.1f}" permlanes="{permlanes}" modes="{lit(modes)}" />\n'
+    )
+    for start in range(0, len(from_ids), WRITE_BATCH):
+        stop = start + WRITE_BATCH
+        rows = zip(
+            range(start, stop), from_ids[start:stop], to_ids[start:stop],
+            lengths[start:stop], freespeeds[start:stop],
+        )
+        links.write("".join(map(tpl.__mod__, rows)))
+
+
+def write_header(out: TextIO, indent: str = INDENT) -> None:
+    out.write(XML_DECLARATION)
+    out.write(MATSim_DOCTYPE)
+    out.write(f"<network>\n{indent}<nodes>\n")
+
+
+def write_footer(out: TextIO, links: TextIO, indent: str = INDENT) -> None:
+    """Close <nodes>, append the spooled links and close the document."""
+    out.write(f"{indent}</nodes>\n{indent}<links>\n")
+    links.seek(0)
+    shutil.copyfileobj(links, out, COPY_BUFSIZE)
+    out.write(f"{indent}</links>\n</network>\n")
 
 # ----------------------------------------------------------------------
 # graph → MATSim conversion
 # ----------------------------------------------------------------------
 
 def graph_to_matsim(
-    g: nx.Graph,
-    root: ET.Element,
-    node_prefix: str,
+    graph: Graph,
+    nodes: TextIO,
+    links: TextIO,
     link_prefix: str,
     default_speed: float,
     modes: str,
+    indent: str = INDENT,
 ) -> None:
-    """Append nodes & links from *g* to *root* with prefixed IDs."""
-    nid_map: Dict[str, str] = {}
+    """Write the nodes & links of *graph* (see :func:`parse_graphml`) to
+    *nodes* / *links*."""
+    graph_nodes, graph_edges = graph
 
     # ---------------- nodes ----------------
-    for nid, attrs in g.nodes(data=True):
-        pid = f"{node_prefix}{nid}"
-        nid_map[nid] = pid
-        lon = attrs.get("x") or attrs.get("lon") or attrs.get("lng")
-        lat = attrs.get("y") or attrs.get("lat")
-
-        if lon is None or lat is None:
-            raise ValueError(f"Node {nid} missing coordinate attributes in GraphML")
+    # one vectorised call instead of one PROJ round-trip per node
+    lon_arr, lat_arr = np.array(list(graph_nodes.values()), dtype=np.float64).reshape(-1, 2).T.copy()
+    xs, ys = transformer.transform(lon_arr, lat_arr)
 
-        x, y = transformer.transform(float(lon), float(lat))
-
-        if x is None or y is None:
-            raise ValueError(f"Node {nid} missing coordinate attributes in GraphML")
-        if root.find(f"nodes/node[@id='{pid}']") is None:
-            add_node(root, pid, float(x), float(y))
+    write_nodes(nodes, list(graph_nodes), xs.tolist(), ys.tolist(), indent)
 
     # ---------------- links ---------------
-    seq = 0
-    for u, v, edata in g.edges(data=True):
-        src, tgt = nid_map[u], nid_map[v]
-
-        length = float(edata.get("distance") or edata.get("length") or 0.0)
-        if length == 0.0:
-            lon1, lat1 = float(g.nodes[u]["x"]), float(g.nodes[u]["y"])
-            lon2, lat2 = float(g.nodes[v]["x"]), float(g.nodes[v]["y"])
-            length = haversine(lon1, lat1, lon2, lat2)
-
-        freespeed = float(edata.get("walking_speed") or edata.get("maxspeed") or default_speed)
+    lengths = np.empty(len(graph_edges), dtype=np.float64)
+    missing: List[int] = []
+    for i, (u, v, edata) in enumerate(graph_edges):
+        lengths[i] = float(edata.get("distance") or 0.0) or float(edata.get("length") or 0.0)
+        if lengths[i] == 0.0:
+            missing.append(i)
+
+    # great‑circle fallback for all length‑less edges in one pass
+    if missing:
+        ends = np.array(
+            [graph_nodes[graph_edges[i][0]] + graph_nodes[graph_edges[i][1]] for i in missing],
+            dtype=np.float64,
+        )
+        lengths[missing] = haversine(ends[:, 0], ends[:, 1], ends[:, 2], ends[:, 3])
+
+    from_ids: List[str] = []
+    to_ids: List[str] = []
+    link_lengths: List[float] = []
+    freespeeds: List[float] = []
+    for (src, tgt, edata), length in zip(graph_edges, lengths.tolist()):
+        # raw GraphML strings: "0" is truthy, so skip zero speeds numerically
+        freespeed = next(
+            (speed for speed in (float(edata.get(k) or 0.0) for k in _SPEED_KEYS) if speed),
+            default_speed,
+        )
 
         oneway_flag = edata.get("oneway")
-        oneway = True if oneway_flag is None else str(oneway_flag).lower() in {"true", "1", "yes"}
+        oneway = oneway_flag is None or oneway_flag in _ONEWAY_TRUE
 
-        link_id = f"{link_prefix}{seq}"; seq += 1
-        add_link(root, link_id, src, tgt, length, freespeed, modes)
+        from_ids.append(src); to_ids.append(tgt)
+        link_lengths.append(length); freespeeds.append(freespeed)
 
         if not oneway:
-            rev_id = f"{link_prefix}{seq}"; seq += 1
-            add_link(root, rev_id, tgt, src, length, freespeed, modes)
-
-# ----------------------------------------------------------------------
-# pretty‑print helper (Py < 3.9)
-# ----------------------------------------------------------------------
+            from_ids.append(tgt); to_ids.append(src)
+            link_lengths.append(length); freespeeds.append(freespeed)
 
-def _indent(elem: ET.Element, level: int = 0):
-    pad = "\n" + "  " * level
-    if len(elem):
-        if not elem.text or not elem.text.strip():
-            elem.text = pad + "  "
-        for child in elem:
-            _indent(child, level + 1)
-        if not child.tail or not child.tail.strip():
-            child.tail = pad
-    if level and (not elem.tail or not elem.tail.strip()):
-        elem.tail = pad
+    write_links(links, link_prefix, from_ids, to_ids, link_lengths, freespeeds, modes,
+                indent=indent)
 
 # ----------------------------------------------------------------------
-# write XML + gz
+# XML + gz outputs
 # ----------------------------------------------------------------------
 
-def write_outputs(root: ET.Element, target: Path) -> None:
-    """Pretty‑print *root* and write both XML and gzipped XML."""
+def output_paths(target: Path) -> Tuple[Path, Path]:
+    """Return ``(xml_path, gz_path)`` for the requested *target*."""
     if target.suffix == ".gz":
-        xml_path = Path(str(target)[:-3])
-        gz_path  = target
-    else:
-        xml_path = target
-        gz_path  = target.with_suffix(target.suffix + ".gz")
-
-    # pretty formatting
-    tree = ET.ElementTree(root)
-    try:
-        ET.indent(tree, space="  ")  # Py ≥ 3.9
-    except AttributeError:
-        _indent(root)
+        return Path(str(target)[:-3]), target
+    return target, target.with_suffix(target.suffix + ".gz")
 
-    body = ET.tostring(root, encoding="utf-8", xml_declaration=False)
-    xml_bytes = b'<?xml version="1.0" encoding="utf-8"?>\n' + MATSim_DOCTYPE + body
 
-    xml_path.write_bytes(xml_bytes)
-    print(f"XML  -> {xml_path}")
+def write_gzip(xml_path: Path, gz_path: Path, level: int = GZIP_LEVEL) -> None:
+    """Compress the finished XML file into *gz_path* without loading it.
 
-    with gzip.open(gz_path, "wb") as fh:
-        fh.write(xml_bytes)
-    print(f"GZIP -> {gz_path}")
+    Uses ``pigz`` (parallel gzip) when it is on ``PATH``, otherwise streams
+    the file through :mod:`gzip` in 1 MiB chunks.
+    """
+    pigz = shutil.which("pigz")
+    if pigz:
+        with open(gz_path, "wb") as dst:
+            subprocess.run([pigz, f"-{level}", "-c", str(xml_path)], stdout=dst, check=True)
+        return
+
+    with open(xml_path, "rb") as src, gzip.open(gz_path, "wb", compresslevel=level) as dst:
+        shutil.copyfileobj(src, dst, COPY_BUFSIZE)
 
 # ----------------------------------------------------------------------
 # CLI & entry point
@@ -213,20 +342,31 @@ def parse_args():
     p.add_argument("drive_graphml", type=Path, help="Vehicle network GraphML")
     p.add_argument("walk_graphml",  type=Path, help="Walking network GraphML")
     p.add_argument("output",        type=Path, help="Output file name (xml or xml.gz)")
+    p.add_argument("--no-pretty", dest="pretty", action="store_false",
+                   help="Skip indentation (smaller files; MATSim does not need it)")
     return p.parse_args()
 
 
 def main() -> None:
     args = parse_args()
 
-    drive_g = read_graph(args.drive_graphml)
-    walk_g  = read_graph(args.walk_graphml)
+    drive = parse_graphml(args.drive_graphml, "v_")
+    walk  = parse_graphml(args.walk_graphml,  "p_")
 
-    root = build_network_root()
-    graph_to_matsim(drive_g, root, "v_", "car_",  CAR_DEFAULT_SPEED,  "car")
-    graph_to_matsim(walk_g,  root, "p_", "walk_", WALK_DEFAULT_SPEED, "walk")
+    indent = INDENT if args.pretty else ""
 
-    write_outputs(root, args.output)
+    xml_path, gz_path = output_paths(args.output)
+    # newline="\n": LF line endings on every platform, as the repo expects
+    with open(xml_path, "w", encoding="utf-8", newline="\n") as out, \
+         tempfile.TemporaryFile("w+", encoding="utf-8", newline="\n") as links:
+        write_header(out, indent)
+        graph_to_matsim(drive, out, links, "car_",  CAR_DEFAULT_SPEED,  "car",  indent)
+        graph_to_matsim(walk,  out, links, "walk_", WALK_DEFAULT_SPEED, "walk", indent)
+        write_footer(out, links, indent)
+    print(f"XML  -> {xml_path}")
+
+    write_gzip(xml_path, gz_path)
+    print(f"GZIP -> {gz_path}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,80 @@
+import io
+import re
+
+import pytest
+
+from combine import _ONEWAY_TRUE, graph_to_matsim, haversine, parse_graphml
+
+GRAPHML = """<?xml version='1.0' encoding='utf-8'?>
+<graphml xmlns="http://graphml.graphdrawing.org/xmlns">
+  <key id="d0" for="node" attr.name="x" attr.type="float" />
+  <key id="d1" for="node" attr.name="y" attr.type="float" />
+  <key id="d2" for="edge" attr.name="distance" attr.type="float" />
+  <key id="d3" for="edge" attr.name="length" attr.type="float" />
+  <key id="d4" for="edge" attr.name="walking_speed" attr.type="float" />
+  <key id="d5" for="edge" attr.name="maxspeed" attr.type="float" />
+  <key id="d6" for="edge" attr.name="oneway" attr.type="string" />
+  <graph edgedefault="directed">
+    <node id="a"><data key="d0">126.8182583</data><data key="d1">37.2098418</data></node>
+    <node id="b"><data key="d0">126.8192583</data><data key="d1">37.2108418</data></node>
+{edges}
+  </graph>
+</graphml>
+"""
+
+LINK = re.compile(r'<link id="car_\d+" from="(\S+)" to="(\S+)" length="(\S+)" freespeed="(\S+)"')
+
+
+def convert(tmp_path, *edges, target="b"):
+    """Parse a two-node GraphML holding *edges* (``<data>`` snippets of an
+    a -> *target* edge) and return the written links as tuples."""
+    path = tmp_path / "graph.graphml"
+    path.write_text(GRAPHML.format(edges="\n".join(
+        f'    <edge source="a" target="{target}">{data}</edge>' for data in edges)))
+    links = io.StringIO()
+    graph_to_matsim(parse_graphml(path, "v_"), io.StringIO(), links, "car_", 15.0, "car")
+    return [(src, tgt, float(length), float(speed))
+            for src, tgt, length, speed in LINK.findall(links.getvalue())]
+
+
+def test_zero_speed_falls_through(tmp_path):
+    links = convert(
+        tmp_path,
+        '<data key="d4">0</data><data key="d5">8.5</data>',
+        '<data key="d4">0</data><data key="d5">0</data>',
+        '<data key="d4">1.2</data><data key="d5">8.5</data>',
+    )
+    assert [speed for *_, speed in links] == [8.5, 15.0, 1.2]
+
+
+def test_zero_distance_falls_through(tmp_path):
+    links = convert(
+        tmp_path,
+        '<data key="d2">0</data><data key="d3">42.5</data>',
+        '<data key="d2">0</data><data key="d3">0</data>',
+        '<data key="d2">7.25</data><data key="d3">42.5</data>',
+    )
+    great_circle = float(haversine(126.8182583, 37.2098418, 126.8192583, 37.2108418))
+    assert [length for _, _, length, _ in links] == pytest.approx(
+        [42.5, great_circle, 7.25], abs=1e-3)
+
+
+@pytest.mark.parametrize("flag", sorted(_ONEWAY_TRUE))
+def test_oneway_spellings(tmp_path, flag):
+    links = convert(tmp_path, f'<data key="d6">{flag}</data>')
+    assert [(src, tgt) for src, tgt, *_ in links] == [("v_a", "v_b")]
+
+
+@pytest.mark.parametrize("flag", ["false", "False", "0", "no"])
+def test_two_way_adds_reverse_link(tmp_path, flag):
+    links = convert(tmp_path, f'<data key="d6">{flag}</data>')
+    assert [(src, tgt) for src, tgt, *_ in links] == [("v_a", "v_b"), ("v_b", "v_a")]
+
+
+def test_missing_oneway_is_oneway(tmp_path):
+    assert [(src, tgt) for src, tgt, *_ in convert(tmp_path, "")] == [("v_a", "v_b")]
+
+
+def test_undeclared_endpoint_raises(tmp_path):
+    with pytest.raises(ValueError, match="Node ghost missing coordinate attributes"):
+        convert(tmp_path, '<data key="d3">1.0</data>', target="ghost")
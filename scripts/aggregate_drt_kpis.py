@@ -1,11 +1,41 @@
 #!/usr/bin/env python3
 
 import argparse
+import importlib.util
 import pandas as pd
 import os
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import glob
 
+# pyarrow's multithreaded CSV reader is several times faster than the C engine
+CSV_ENGINE = 'pyarrow' if importlib.util.find_spec('pyarrow') else 'c'
+# pyarrow always parses floats exactly; make the C engine do the same so the
+# summary doesn't depend on whether pyarrow is installed
+CSV_OPTIONS = {'engine': CSV_ENGINE}
+if CSV_ENGINE == 'c':
+    CSV_OPTIONS['float_precision'] = 'round_trip'
+
+# Columns needed from each stats file; everything else is skipped at parse time
+KPI_KEY_COLUMNS = ['runId', 'iteration']
+CUSTOMER_KPI_COLUMNS = [
+    'runId', 'iteration',
+    'rides', 'rides_pax', 'wait_average', 'wait_max', 'wait_p95',
+    'inVehicleTravelTime_mean', 'totalTravelTime_mean',
+    'distance_m_mean', 'directDistance_m_mean',
+    'rejections', 'rejectionRate'
+]
+VEHICLE_KPI_COLUMNS = [
+    'runId', 'iteration',
+    'vehicles', 'totalDistance', 'totalEmptyDistance', 'emptyRatio',
+    'totalPassengerDistanceTraveled', 'averageDrivenDistance',
+    'minShareIdleVehicles'
+]
+SHARING_KPI_COLUMNS = [
+    'runId', 'iteration',
+    'poolingRate', 'sharingFactor', 'nPooled', 'nTotal'
+]
+
 def find_stats_file(directory, pattern):
     """Find a stats file matching the pattern in the directory."""
     matches = list(directory.glob(f"*{pattern}"))
@@ -14,15 +44,15 @@ def find_stats_file(directory, pattern):
         return None
     return matches[0]
 
-def load_drt_stats(filepath):
+def load_drt_stats(filepath, usecols=None):
     """Load DRT stats CSV with proper delimiter handling."""
     try:
         # Try semicolon first (MATSim default)
-        df = pd.read_csv(filepath, sep=';')
+        df = pd.read_csv(filepath, sep=';', usecols=usecols, **CSV_OPTIONS)
     except:
         try:
             # Fallback to comma
-            df = pd.read_csv(filepath)
+            df = pd.read_csv(filepath, usecols=usecols, **CSV_OPTIONS)
         except Exception as e:
             print(f"Error reading {filepath}: {e}")
             return None
@@ -43,44 +73,31 @@ def aggregate_kpis(input_dir, output_dir):
         print("Error: Could not find all required stats files")
         return False
 
-    # Load the stats files
-    customer_stats = load_drt_stats(customer_stats_file)
-    vehicle_stats = load_drt_stats(vehicle_stats_file)
-    sharing_stats = load_drt_stats(sharing_stats_file)
+    # Load the stats files concurrently (parsing is I/O bound and releases the GIL)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        customer_stats, vehicle_stats, sharing_stats = pool.map(
+            load_drt_stats,
+            [customer_stats_file, vehicle_stats_file, sharing_stats_file],
+            [CUSTOMER_KPI_COLUMNS, VEHICLE_KPI_COLUMNS, SHARING_KPI_COLUMNS]
+        )
 
     if not all([customer_stats is not None, vehicle_stats is not None, sharing_stats is not None]):
         print("Error: Could not load all required stats files")
         return False
 
-    # Extract key KPIs from customer stats
-    customer_kpis = customer_stats[[
-        'runId', 'iteration',
-        'rides', 'rides_pax', 'wait_average', 'wait_max', 'wait_p95',
-        'inVehicleTravelTime_mean', 'totalTravelTime_mean',
-        'distance_m_mean', 'directDistance_m_mean',
-        'rejections', 'rejectionRate'
-    ]]
-
-    # Extract key KPIs from vehicle stats
-    vehicle_kpis = vehicle_stats[[
-        'runId', 'iteration',
-        'vehicles', 'totalDistance', 'totalEmptyDistance', 'emptyRatio',
-        'totalPassengerDistanceTraveled', 'averageDrivenDistance',
-        'minShareIdleVehicles'
-    ]]
-
-    # Extract key KPIs from sharing stats
-    sharing_kpis = sharing_stats[[
-        'runId', 'iteration',
-        'poolingRate', 'sharingFactor', 'nPooled', 'nTotal'
-    ]]
-
-    # Merge all KPIs on runId and iteration
-    merged_kpis = customer_kpis.merge(
-        vehicle_kpis, on=['runId', 'iteration']
-    ).merge(
-        sharing_kpis, on=['runId', 'iteration']
-    )
+    # Extract key KPIs from each stats file, keyed by runId and iteration
+    kpi_frames = [
+        stats[columns].set_index(KPI_KEY_COLUMNS)
+        for stats, columns in [(customer_stats, CUSTOMER_KPI_COLUMNS),
+                               (vehicle_stats, VEHICLE_KPI_COLUMNS),
+                               (sharing_stats, SHARING_KPI_COLUMNS)]
+    ]
+    if not all(frame.index.is_unique for frame in kpi_frames):
+        print("Error: Duplicate runId/iteration rows in stats files")
+        return False
+
+    # Align all KPIs on the shared runId/iteration index (inner join, like the previous merges)
+    merged_kpis = pd.concat(kpi_frames, axis=1, join='inner').reset_index()
 
     # Add derived KPIs
     merged_kpis['detour_factor'] = merged_kpis['distance_m_mean'] / merged_kpis['directDistance_m_mean']
@@ -1,21 +1,53 @@
 #!/usr/bin/env python3
 
 import argparse
+import hashlib
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from scipy import stats
+import shutil
 import sys
 import os
+import tempfile
 
 # Add the scripts directory to the path so we can import our KPI aggregator
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from aggregate_drt_kpis import aggregate_kpis
+from aggregate_drt_kpis import (aggregate_kpis, CUSTOMER_KPI_COLUMNS,
+                                VEHICLE_KPI_COLUMNS, SHARING_KPI_COLUMNS)
+
+KPI_CACHE_PREFIX = ".kpi_cache_"
+# Bump whenever aggregate_kpis changes what it writes (e.g. a new derived
+# KPI) so summaries cached by older versions are regenerated
+KPI_CACHE_VERSION = 1
+
+def stats_signature(directory):
+    """Fingerprint the CSV files in a run directory by name and mtime,
+    together with the cache version and the KPI columns being aggregated."""
+    entries = sorted(
+        (p.stat().st_mtime_ns, p.name) for p in directory.glob('*.csv')
+        if not p.name.startswith(KPI_CACHE_PREFIX)
+    )
+    key = (KPI_CACHE_VERSION, CUSTOMER_KPI_COLUMNS, VEHICLE_KPI_COLUMNS,
+           SHARING_KPI_COLUMNS, entries)
+    # blake2b is the fastest hashlib digest in CPython
+    return hashlib.blake2b(str(key).encode()).hexdigest()[:16]
 
 def generate_kpis_if_needed(directory, temp_dir):
-    """Generate KPI summary if it doesn't exist."""
-    kpi_dir = temp_dir / "temp_kpis"
-    kpi_dir.mkdir(parents=True, exist_ok=True)
+    """Generate KPI summary if it doesn't exist.
+
+    The summary is cached in the run directory as .kpi_cache_<signature>.csv
+    and reused as long as the run's CSV files are unchanged.
+    """
+    directory = Path(directory)
+    cache_file = directory / f"{KPI_CACHE_PREFIX}{stats_signature(directory)}.csv"
+    if cache_file.exists():
+        print(f"Using cached KPI summary: {cache_file}")
+        return cache_file
+    
+    # Aggregate into a fresh directory per run so summaries never mix
+    temp_dir.mkdir(parents=True, exist_ok=True)
+    kpi_dir = Path(tempfile.mkdtemp(prefix="temp_kpis_", dir=temp_dir))
     
     if not aggregate_kpis(directory, kpi_dir):
         return None
@@ -25,7 +57,24 @@ def generate_kpis_if_needed(directory, temp_dir):
     if not kpi_files:
         return None
     
-    return kpi_files[0]
+    # Write to a temp file and rename it into place, so a concurrent
+    # comparison never sees a partially written cache file
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(prefix=KPI_CACHE_PREFIX, suffix=".tmp", dir=directory)
+        os.close(fd)
+        shutil.copyfile(kpi_files[0], tmp_path)
+        os.replace(tmp_path, cache_file)
+        for stale in directory.glob(f"{KPI_CACHE_PREFIX}*.csv"):
+            if stale != cache_file:
+                stale.unlink(missing_ok=True)
+    except OSError as e:
+        print(f"Warning: Could not cache KPI summary in {directory}: {e}")
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return kpi_files[0]
+    
+    return cache_file
 
 def load_kpi_summary(kpi_file):
     """Load KPI summary CSV."""
@@ -45,6 +94,43 @@ def calculate_statistical_significance(baseline_values, preference_values, alpha
     except:
         return np.nan, False
 
+def calculate_statistical_significance_by_metric(baseline_block, preference_block, alpha=0.05):
+    """Run calculate_statistical_significance on every column of two
+    (iteration x metric) arrays.
+
+    mannwhitneyu picks its method ('exact' or 'asymptotic') once per call from
+    the sample sizes and whether there are ties, so columns are batched only
+    with columns that would get the same method on their own: all columns
+    share the sample sizes, and they are grouped by whether they contain ties.
+    Returns arrays of p-values and significance flags, one per column.
+    """
+    baseline_block = np.asarray(baseline_block, dtype=float)
+    preference_block = np.asarray(preference_block, dtype=float)
+    n_metrics = baseline_block.shape[1]
+    p_values = np.full(n_metrics, np.nan)
+    is_significant = np.zeros(n_metrics, dtype=bool)
+
+    pooled = np.sort(np.vstack([baseline_block, preference_block]), axis=0)
+    has_ties = (np.diff(pooled, axis=0) == 0).any(axis=0)
+
+    for ties in (False, True):
+        columns = np.flatnonzero(has_ties == ties)
+        if columns.size == 0:
+            continue
+        group_p, group_significant = calculate_statistical_significance(
+            baseline_block[:, columns], preference_block[:, columns], alpha)
+        if np.ndim(group_p) == 0:
+            # The batched call failed; test columns one by one so a single
+            # bad metric doesn't void the others
+            results = [calculate_statistical_significance(baseline_block[:, j], preference_block[:, j], alpha)
+                       for j in columns]
+            group_p = [r[0] for r in results]
+            group_significant = [r[1] for r in results]
+        p_values[columns] = group_p
+        is_significant[columns] = group_significant
+
+    return p_values, is_significant
+
 def compare_runs(baseline_dir, preference_dir, output_dir):
     """Compare two MATSim DRT runs and generate comparison metrics."""
     output_path = Path(output_dir)
@@ -89,36 +175,40 @@ def compare_runs(baseline_dir, preference_dir, output_dir):
         'poolingRate', 'sharingFactor', 'detour_factor', 'avg_occupancy'
     ]
     
+    metrics = [metric for metric in metrics_to_compare
+               if metric in baseline_aligned.columns and metric in preference_aligned.columns]
+    
+    # Iteration x metric blocks; deltas are computed on whole blocks at once
+    baseline_block = baseline_aligned[metrics].set_axis(comparison.index)
+    preference_block = preference_aligned[metrics].set_axis(comparison.index)
+    delta_block = preference_block - baseline_block
+    delta_pct_block = delta_block / baseline_block * 100
+    
     # Add baseline, preference, and delta columns for each metric
-    for metric in metrics_to_compare:
-        if metric in baseline_aligned.columns and metric in preference_aligned.columns:
-            comparison[f'baseline_{metric}'] = baseline_aligned[metric].values
-            comparison[f'preference_{metric}'] = preference_aligned[metric].values
-            comparison[f'delta_{metric}'] = preference_aligned[metric].values - baseline_aligned[metric].values
-            comparison[f'delta_pct_{metric}'] = ((preference_aligned[metric].values - baseline_aligned[metric].values) / 
-                                                baseline_aligned[metric].values * 100)
+    blocks = pd.concat([baseline_block.add_prefix('baseline_'),
+                        preference_block.add_prefix('preference_'),
+                        delta_block.add_prefix('delta_'),
+                        delta_pct_block.add_prefix('delta_pct_')], axis=1)
+    columns = [f'{prefix}_{metric}' for metric in metrics
+               for prefix in ('baseline', 'preference', 'delta', 'delta_pct')]
+    comparison = pd.concat([comparison, blocks[columns]], axis=1)
     
     # Calculate overall statistics for final iterations
     final_baseline = baseline_aligned.iloc[-1]
     final_preference = preference_aligned.iloc[-1]
     
-    # Generate summary statistics
-    summary_stats = {}
-    for metric in metrics_to_compare:
-        if metric in baseline_aligned.columns and metric in preference_aligned.columns:
-            baseline_vals = baseline_aligned[metric].values
-            preference_vals = preference_aligned[metric].values
-            
-            p_value, is_significant = calculate_statistical_significance(baseline_vals, preference_vals)
-            
-            summary_stats[metric] = {
-                'baseline_final': final_baseline[metric],
-                'preference_final': final_preference[metric],
-                'delta_final': final_preference[metric] - final_baseline[metric],
-                'delta_pct_final': ((final_preference[metric] - final_baseline[metric]) / final_baseline[metric] * 100),
-                'p_value': p_value,
-                'is_significant': is_significant
-            }
+    # Generate summary statistics (Mann-Whitney batched over metrics with the same test method)
+    p_values, is_significant = calculate_statistical_significance_by_metric(
+        baseline_block.to_numpy(dtype=float), preference_block.to_numpy(dtype=float))
+    
+    summary_df = pd.DataFrame({
+        'baseline_final': baseline_block.iloc[-1],
+        'preference_final': preference_block.iloc[-1],
+        'delta_final': delta_block.iloc[-1],
+        'delta_pct_final': delta_pct_block.iloc[-1],
+        'p_value': p_values,
+        'is_significant': is_significant
+    }, index=metrics)
     
     # Save detailed comparison
     baseline_run_id = baseline_aligned['runId'].iloc[0]
@@ -128,7 +218,6 @@ def compare_runs(baseline_dir, preference_dir, output_dir):
     print(f"Detailed comparison saved to: {comparison_file}")
     
     # Save summary statistics
-    summary_df = pd.DataFrame.from_dict(summary_stats, orient='index')
     summary_file = output_path / f"summary_{baseline_run_id}_vs_{preference_run_id}.csv"
     summary_df.to_csv(summary_file)
     print(f"Summary statistics saved to: {summary_file}")
@@ -147,7 +236,6 @@ def compare_runs(baseline_dir, preference_dir, output_dir):
           f"(Δ{((1-final_preference['minShareIdleVehicles']) - (1-final_baseline['minShareIdleVehicles']))*100:+.1f}pp)")
     
     # Clean up temp files
-    import shutil
     if temp_dir.exists():
         shutil.rmtree(temp_dir)
     
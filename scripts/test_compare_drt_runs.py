@@ -0,0 +1,24 @@
+import numpy as np
+
+from compare_drt_runs import (calculate_statistical_significance,
+                              calculate_statistical_significance_by_metric)
+
+
+def test_batched_p_values_match_per_metric_tests():
+    rng = np.random.default_rng(0)
+    # 8 iterations: small enough for the exact test where there are no ties
+    baseline = rng.normal(size=(8, 4))
+    preference = rng.normal(loc=1.0, size=(8, 4))
+    # A constant metric (e.g. fleet size) has ties and must not change the
+    # method used for the other metrics
+    baseline[:, 1] = 10
+    preference[:, 1] = 10
+    # Ties between runs in another metric
+    preference[:3, 3] = baseline[:3, 3]
+
+    p_values, is_significant = calculate_statistical_significance_by_metric(baseline, preference)
+
+    expected = [calculate_statistical_significance(baseline[:, j], preference[:, j])
+                for j in range(baseline.shape[1])]
+    np.testing.assert_allclose(p_values, [p for p, _ in expected], rtol=1e-12)
+    np.testing.assert_array_equal(is_significant, [s for _, s in expected])